@@ -1,24 +1,97 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, jsonify, abort, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, current_user, logout_user
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+import copy
 import os
+import sqlite3
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from enum import Enum
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.types import TypeDecorator
+
+class OrjsonProvider(DefaultJSONProvider):
+    # C-backed JSON encoding; dates serialize to ISO format natively
+    @staticmethod
+    def _orjson_default(o):
+        if isinstance(o, Enum):
+            return o.value
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        # Honors sort_keys (app.json.sort_keys) and indent (non-compact responses). orjson always
+        # writes compact separators and UTF-8, so separators and ensure_ascii are not supported.
+        option = orjson.OPT_NAIVE_UTC
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self._orjson_default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        # json.loads keyword options (object_hook etc.) are not supported by orjson
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///expenses.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True, 'pool_recycle': 1800}
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(pool_size=10, max_overflow=20)
+# Log every SQL statement (set SQLALCHEMY_ECHO=1 in dev to spot N+1 regressions)
+app.config['SQLALCHEMY_ECHO'] = os.environ.get('SQLALCHEMY_ECHO') == '1'
+# Hash method for new passwords; None keeps Werkzeug's default (scrypt). Set
+# PASSWORD_HASH_METHOD, or PASSWORD_HASH_ITERATIONS for PBKDF2-SHA256, to trade
+# cost for speed (e.g. in dev). Existing hashes keep verifying with their own method.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD') or None
+if not app.config['PASSWORD_HASH_METHOD'] and os.environ.get('PASSWORD_HASH_ITERATIONS'):
+    try:
+        _hash_iterations = int(os.environ['PASSWORD_HASH_ITERATIONS'])
+    except ValueError:
+        raise RuntimeError('PASSWORD_HASH_ITERATIONS must be an integer')
+    if _hash_iterations < 1:
+        raise RuntimeError('PASSWORD_HASH_ITERATIONS must be positive')
+    app.config['PASSWORD_HASH_METHOD'] = f'pbkdf2:sha256:{_hash_iterations}'
+if app.config['PASSWORD_HASH_METHOD']:
+    # Fail at startup rather than on the first signup
+    try:
+        generate_password_hash('', method=app.config['PASSWORD_HASH_METHOD'])
+    except (ValueError, TypeError) as e:
+        raise RuntimeError(f"Invalid PASSWORD_HASH_METHOD {app.config['PASSWORD_HASH_METHOD']!r}: {e}")
 
 # Enable CORS for frontend connectivity (allows cross-origin requests from e.g., React/Vue/Angular on different ports)
 # For production, restrict origins e.g., origins=["http://localhost:3000"]
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
 db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside a writer; NORMAL sync skips an fsync per commit
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.execute('PRAGMA cache_size=-20000')
+    cursor.close()
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -33,6 +106,38 @@ class Status(Enum):
     APPROVED = 'approved'
     REJECTED = 'rejected'
 
+# Stored integer codes. These are persisted: never renumber or reuse a code.
+ROLE_CODES = {'admin': 1, 'manager': 2, 'employee': 3}
+STATUS_CODES = {'pending': 1, 'approved': 2, 'rejected': 3}
+ACTION_CODES = {'approved': STATUS_CODES['approved'], 'rejected': STATUS_CODES['rejected']}
+
+class EnumInt(TypeDecorator):
+    # Stores string values as small ints via a fixed code table; Python code keeps using the strings
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def __init__(self, codes, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = tuple(sorted(codes.items()))  # hashable, for the statement cache key
+        self._to_int = dict(codes)
+        self._from_int = {i: value for value, i in codes.items()}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, Enum):
+            value = value.value
+        if value not in self._to_int:
+            raise ValueError(f"Invalid value {value!r}, expected one of {sorted(self._to_int)}")
+        return self._to_int[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value not in self._from_int:
+            raise ValueError(f"Unknown stored code {value!r}; run migrate.py to convert legacy values")
+        return self._from_int[value]
+
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -44,10 +149,14 @@ class User(UserMixin, db.Model):
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.Enum('admin', 'manager', 'employee'), nullable=False)
+    role = db.Column(EnumInt(ROLE_CODES), nullable=False)
     manager_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     company = db.relationship('Company', backref='users')
-    manager = db.relationship('User ', remote_side=[id], backref='direct_subordinates')
+    manager = db.relationship('User', remote_side=[id], backref='direct_subordinates')
+    __table_args__ = (
+        db.Index('ix_user_company_role', 'company_id', 'role'),
+        db.Index('ix_user_manager', 'manager_id'),
+    )
 
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,21 +167,28 @@ class Expense(db.Model):
     category = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text)
     date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.Enum('pending', 'approved', 'rejected'), default='pending')
+    status = db.Column(EnumInt(STATUS_CODES), default='pending')
     comments = db.Column(db.Text)
     receipt_url = db.Column(db.String(200))
-    employee = db.relationship('User ', backref='expenses')
+    employee = db.relationship('User', backref='expenses')
+    __table_args__ = (
+        db.Index('ix_expense_employee', 'employee_id'),
+    )
 
 class Approval(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     expense_id = db.Column(db.Integer, db.ForeignKey('expense.id'), nullable=False)
     approver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     step = db.Column(db.Integer, default=1)
-    action = db.Column(db.Enum('approved', 'rejected'))
+    action = db.Column(EnumInt(ACTION_CODES))
     comments = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=func.now())
-    approver = db.relationship('User ')
+    approver = db.relationship('User')
     expense = db.relationship('Expense', backref='approvals')
+    __table_args__ = (
+        db.Index('ix_approval_approver_action', 'approver_id', 'action'),
+        db.Index('ix_approval_expense_action', 'expense_id', 'action'),
+    )
 
 class Workflow(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -89,53 +205,187 @@ class Workflow(db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
 
 # Decorators
 def role_required(*roles):
+    allowed = frozenset(roles)
     def decorator(f):
         from functools import wraps
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if not current_user.is_authenticated:
+            user = current_user._get_current_object()  # resolve the proxy once
+            if not user.is_authenticated:
                 abort(401)
-            if current_user.role not in roles:
+            if user.role not in allowed:
                 abort(403)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
+# Shared HTTP session so outbound TCP/TLS connections are reused across requests
+HTTP_TIMEOUT = (3, 5)  # (connect, read) seconds
+_http = requests.Session()
+_http_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+_http.mount('http://', _http_adapter)
+_http.mount('https://', _http_adapter)
+
+# Background pool for outbound lookups that can overlap with request work
+_executor = ThreadPoolExecutor(max_workers=8)
+
 # Helper functions
+# Country -> currency barely ever changes, so keep lookups for a day: {key: (currency, fetched_at)}.
+# Keys are user input, so the cache is an LRU capped at COUNTRY_CURRENCY_CACHE_SIZE entries.
+COUNTRY_CURRENCY_TTL = 24 * 3600
+COUNTRY_CURRENCY_CACHE_SIZE = 512
+_country_currency_cache = OrderedDict()
+_country_currency_lock = threading.Lock()
+
 def get_currency_for_country(country_name):
-    url = f"https://restcountries.com/v3.1/name/{country_name}?fields=name,currencies"
-    response = requests.get(url)
+    key = country_name.strip().lower()
+    with _country_currency_lock:
+        cached = _country_currency_cache.get(key)
+        if cached:
+            _country_currency_cache.move_to_end(key)
+    if cached and time.time() - cached[1] < COUNTRY_CURRENCY_TTL:
+        return cached[0]
+    url = f"https://restcountries.com/v3.1/name/{quote(country_name.strip(), safe='')}?fields=name,currencies"
+    try:
+        response = _http.get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException:
+        response = None
+    if response is None or response.status_code >= 500:
+        # Upstream is down: serve the last known value rather than failing signup
+        if cached:
+            app.logger.warning('restcountries unavailable, using stale currency for %s', country_name)
+            return cached[0]
+        return None
     if response.status_code != 200:
         return None
     data = response.json()
     if not data or 'currencies' not in data[0]:
         return None
     currencies = data[0]['currencies']
-    return list(currencies.keys())[0] if currencies else None
+    currency = list(currencies.keys())[0] if currencies else None
+    if currency:
+        with _country_currency_lock:
+            _country_currency_cache[key] = (currency, time.time())
+            _country_currency_cache.move_to_end(key)
+            while len(_country_currency_cache) > COUNTRY_CURRENCY_CACHE_SIZE:
+                _country_currency_cache.popitem(last=False)
+    return currency
+
+# Full rate tables per base currency: {to_curr: (rates, fetched_at)}
+RATE_CACHE_TTL = 6 * 3600
+_rate_cache = {}
+_rate_cache_lock = threading.Lock()
+# One fetch lock per base currency so a slow fetch only blocks callers needing that table
+_rate_fetch_locks = {}
+
+def _fresh_rates(to_curr):
+    with _rate_cache_lock:
+        cached = _rate_cache.get(to_curr)
+    if cached and time.time() - cached[1] < RATE_CACHE_TTL:
+        return cached[0], cached
+    return None, cached
+
+def get_rates(to_curr):
+    rates, cached = _fresh_rates(to_curr)
+    if rates is not None:
+        return rates
+    with _rate_cache_lock:
+        fetch_lock = _rate_fetch_locks.setdefault(to_curr, threading.Lock())
+    with fetch_lock:
+        # Another thread may have refreshed the table while we waited
+        rates, cached = _fresh_rates(to_curr)
+        if rates is not None:
+            return rates
+        url = f"https://api.exchangerate-api.com/v4/latest/{to_curr}"
+        try:
+            response = _http.get(url, timeout=HTTP_TIMEOUT)
+        except requests.RequestException:
+            response = None
+        if response is None or response.status_code != 200:
+            if cached:
+                app.logger.warning('exchangerate-api unavailable, using stale rates for %s', to_curr)
+                return cached[0]
+            raise ValueError("Currency conversion failed")
+        rates = response.json()['rates']
+        with _rate_cache_lock:
+            _rate_cache[to_curr] = (rates, time.time())
+        return rates
 
 def convert_currency(amount, from_curr, to_curr):
     if from_curr == to_curr:
         return amount
-    url = f"https://api.exchangerate-api.com/v4/latest/{to_curr}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise ValueError("Currency conversion failed")
-    rates = response.json()['rates']
+    rates = get_rates(to_curr)
     if from_curr not in rates:
         raise ValueError("Unsupported currency")
     return amount / rates[from_curr]
 
-def determine_approver(employee, step, company):
+def hash_password(password):
+    method = app.config['PASSWORD_HASH_METHOD']
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+def _log_prewarm_failure(currency, future):
+    exc = future.exception()
+    if exc is not None:
+        app.logger.warning('FX rate prewarm for %s failed: %s', currency, exc)
+
+# Workflow configs per company: {company_id: (config, cached_at)}. Updates invalidate the
+# local entry; the TTL bounds how long other worker processes can serve an old config.
+WORKFLOW_CACHE_TTL = 60
+_workflow_cache = {}
+# Bumped on every update so a read that started before it cannot re-cache the old config
+_workflow_generation = {}
+_workflow_cache_lock = threading.Lock()
+
+def get_workflow_config(company_id):
+    with _workflow_cache_lock:
+        cached = _workflow_cache.get(company_id)
+        generation = _workflow_generation.get(company_id, 0)
+    if cached and time.time() - cached[1] < WORKFLOW_CACHE_TTL:
+        return cached[0]
+    workflow = Workflow.query.filter_by(company_id=company_id).first()
+    if not workflow:
+        return None
+    # Cache a private copy, not the dict owned by the ORM instance
+    config = copy.deepcopy(workflow.config)
+    with _workflow_cache_lock:
+        if _workflow_generation.get(company_id, 0) == generation:
+            _workflow_cache[company_id] = (config, time.time())
+    return config
+
+def invalidate_workflow_config(company_id):
+    with _workflow_cache_lock:
+        _workflow_generation[company_id] = _workflow_generation.get(company_id, 0) + 1
+        _workflow_cache.pop(company_id, None)
+
+def load_role_approvers(company_id, steps):
+    # One query for every role step instead of one per step: {role: user_id}
+    roles = {s['role'] for s in steps if s['type'] == 'role'} & {r.value for r in Role}
+    if not roles:
+        return {}
+    rows = db.session.query(User.role, User.id).filter(
+        User.company_id == company_id, User.role.in_(roles)
+    ).order_by(User.id).all()
+    role_to_uid = {}
+    for role, user_id in rows:
+        role_to_uid.setdefault(role, user_id)
+    return role_to_uid
+
+def determine_approver(employee, step, role_to_uid):
+    # Returns the approver's user id, or None if the step has no approver
     if step['type'] == 'manager_of_submitter':
-        return employee.manager
+        return employee.manager_id
     elif step['type'] == 'role':
-        return User.query.filter_by(role=step['role'], company_id=company.id).first()
+        return role_to_uid.get(step['role'])
     elif step['type'] == 'user':
-        return User.query.get(step.get('user_id'))
+        user_id = step.get('user_id')
+        user = db.session.get(User, user_id) if user_id else None
+        return user.id if user else None
     return None
 
 def create_initial_approvals(expense, workflow_config, employee, company):
@@ -144,43 +394,64 @@ def create_initial_approvals(expense, workflow_config, employee, company):
     if exp_type == 'sequential':
         if steps:
             first_step = steps[0]
-            approver = determine_approver(employee, first_step, company)
-            if approver:
-                approval = Approval(expense_id=expense.id, approver_id=approver.id, step=1)
+            role_to_uid = load_role_approvers(company.id, [first_step])
+            approver_id = determine_approver(employee, first_step, role_to_uid)
+            if approver_id:
+                approval = Approval(expense_id=expense.id, approver_id=approver_id, step=1)
                 db.session.add(approval)
             else:
                 expense.status = 'approved'  # No approver, auto-approve
     elif exp_type == 'parallel_conditional':
+        role_to_uid = load_role_approvers(company.id, steps)
         for i, step in enumerate(steps, 1):
-            approver = determine_approver(employee, step, company)
-            if approver:
-                approval = Approval(expense_id=expense.id, approver_id=approver.id, step=i)
+            approver_id = determine_approver(employee, step, role_to_uid)
+            if approver_id:
+                approval = Approval(expense_id=expense.id, approver_id=approver_id, step=i)
                 db.session.add(approval)
     # For hybrid/combination, extend logic here as needed
 
 def evaluate_conditional(expense_id, workflow_config):
-    approvals = Approval.query.filter_by(expense_id=expense_id).all()
-    if not approvals:
-        return
-    approved_count = sum(1 for a in approvals if a.action == 'approved')
-    total = len(approvals)
     cond = workflow_config.get('conditional')
     if not cond:
         return
+    specific_ids = cond.get('specific') or []
+    # Aggregate in SQL rather than loading every approval row
+    row = db.session.query(
+        func.count().label('total'),
+        func.count(Approval.action).label('acted'),
+        func.sum(case((Approval.action == 'approved', 1), else_=0)).label('approved'),
+        func.sum(case((Approval.action == 'rejected', 1), else_=0)).label('rejected'),
+        func.sum(case(
+            (and_(Approval.action == 'approved', Approval.approver_id.in_(specific_ids)), 1), else_=0
+        )).label('specific'),
+    ).filter(Approval.expense_id == expense_id).one()
+    total = row.total
+    if not total:
+        return
+    approved_count = row.approved or 0
     threshold_met = cond.get('threshold') and (approved_count / total * 100 >= cond['threshold'])
-    specific_met = False
-    if 'specific' in cond:
-        specific_ids = cond['specific']
-        specific_met = any(a.action == 'approved' and a.approver_id in specific_ids for a in approvals)
-    all_rejected = all(a.action == 'rejected' for a in approvals if a.action is not None)
+    specific_met = bool(specific_ids) and (row.specific or 0) > 0
+    all_rejected = (row.rejected or 0) == row.acted
+    # The caller commits, so the approval action and status change land together
     if threshold_met or specific_met:
-        expense = Expense.query.get(expense_id)
+        expense = db.session.get(Expense, expense_id)
         expense.status = 'approved'
-        db.session.commit()
     elif all_rejected:
-        expense = Expense.query.get(expense_id)
+        expense = db.session.get(Expense, expense_id)
         expense.status = 'rejected'
-        db.session.commit()
+
+STREAM_BATCH_SIZE = 500
+
+def stream_json_list(items):
+    # Encode a JSON array item by item so the full result set is never held in memory
+    def generate():
+        yield '['
+        for i, item in enumerate(items):
+            if i:
+                yield ','
+            yield app.json.dumps(item)
+        yield ']'
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 # Routes
 @app.route('/signup', methods=['POST'])
@@ -194,15 +465,22 @@ def signup():
         return jsonify({'error': 'Missing fields'}), 400
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email exists'}), 400
-    currency = get_currency_for_country(country_name)
+    if not isinstance(country_name, str):
+        return jsonify({'error': 'Invalid country or no currency'}), 400
+    # Look up the currency while the password is being hashed
+    currency_future = _executor.submit(get_currency_for_country, country_name)
+    password_hash = hash_password(password)
+    currency = currency_future.result()
     if not currency:
         return jsonify({'error': 'Invalid country or no currency'}), 400
+    # Pre-warm the FX table so the company's first expense skips the fetch
+    _executor.submit(get_rates, currency).add_done_callback(partial(_log_prewarm_failure, currency))
     company = Company(name=company_name, currency=currency, country=country_name)
     db.session.add(company)
     db.session.flush()
     user = User(
         email=email,
-        password_hash=generate_password_hash(password),
+        password_hash=password_hash,
         role='admin',
         company_id=company.id
     )
@@ -255,12 +533,12 @@ def create_user():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email exists'}), 400
     if manager_id:
-        manager = User.query.get(manager_id)
+        manager = db.session.get(User, manager_id)
         if not manager or manager.company_id != company_id:
             return jsonify({'error': 'Invalid manager'}), 400
     user = User(
         email=email,
-        password_hash=generate_password_hash(password),
+        password_hash=hash_password(password),
         role=role,
         company_id=company_id,
         manager_id=manager_id
@@ -273,14 +551,16 @@ def create_user():
 @login_required
 @role_required('admin')
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
     if user.company_id != current_user.company_id:
         abort(403)
     data = request.json
     if 'role' in data:
+        if data['role'] not in ['admin', 'manager', 'employee']:
+            return jsonify({'error': 'Invalid role'}), 400
         user.role = data['role']
     if 'manager_id' in data:
-        manager = User.query.get(data['manager_id']) if data['manager_id'] else None
+        manager = db.session.get(User, data['manager_id']) if data['manager_id'] else None
         if manager and manager.company_id != current_user.company_id:
             return jsonify({'error': 'Invalid manager'}), 400
         user.manager_id = manager.id if manager else None
@@ -317,9 +597,9 @@ def submit_expense():
     )
     db.session.add(expense)
     db.session.flush()
-    workflow = Workflow.query.filter_by(company_id=company.id).first()
-    if workflow:
-        create_initial_approvals(expense, workflow.config, current_user, company)
+    workflow_config = get_workflow_config(company.id)
+    if workflow_config:
+        create_initial_approvals(expense, workflow_config, current_user, company)
     else:
         expense.status = 'pending'
     db.session.commit()
@@ -329,59 +609,67 @@ def submit_expense():
 @login_required
 def my_expenses():
     if current_user.role == 'employee':
-        expenses = current_user.expenses
+        expenses = Expense.query.filter_by(employee_id=current_user.id)
     elif current_user.role == 'manager':
         # Direct subordinates only (for multi-level, implement recursive CTE)
-        sub_ids = [sub.id for sub in current_user.direct_subordinates]
-        expenses = Expense.query.filter(Expense.employee_id.in_(sub_ids)).all()
+        expenses = db.session.query(
+            Expense.id, Expense.amount_converted, Expense.category, Expense.status, Expense.date
+        ).join(User, Expense.employee_id == User.id).filter(User.manager_id == current_user.id)
     else:  # admin
-        expenses = Expense.query.join(User).filter(User.company_id == current_user.company_id).all()
-    return jsonify([{
+        # Columns-only query: rows expose the same attributes without ORM hydration
+        expenses = db.session.query(
+            Expense.id, Expense.amount_converted, Expense.category, Expense.status, Expense.date
+        ).join(User, Expense.employee_id == User.id).filter(
+            User.company_id == current_user.company_id
+        )
+    expenses = expenses.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+    return stream_json_list({
         'id': e.id,
         'amount_converted': e.amount_converted,
         'category': e.category,
-        'status': e.status.value,
-        'date': e.date.isoformat()
-    } for e in expenses])
+        'status': e.status,
+        'date': e.date
+    } for e in expenses)
 
 @app.route('/approvals/pending', methods=['GET'])
 @login_required
 @role_required('manager', 'admin')
 def pending_approvals():
-    approvals = Approval.query.filter_by(approver_id=current_user.id, action=None).all()
-    expense_ids = [a.expense_id for a in approvals]
-    expenses = Expense.query.filter(Expense.id.in_(expense_ids)).all()
-    # Map approvals to expenses
-    exp_dict = {e.id: e for e in expenses}
-    result = []
-    for approval in approvals:
-        exp = exp_dict[approval.expense_id]
-        result.append({
-            'expense_id': exp.id,
-            'approval_id': approval.id,
-            'amount_converted': exp.amount_converted,
-            'category': exp.category,
-            'description': exp.description,
-            'step': approval.step,
-            'employee_email': exp.employee.email
-        })
-    return jsonify(result)
+    # Columns-only join: one query, no ORM objects for pure scalar reads
+    rows = db.session.query(
+        Approval.id.label('approval_id'), Approval.step, Expense.id.label('expense_id'),
+        Expense.amount_converted, Expense.category, Expense.description, User.email
+    ).join(Expense, Approval.expense_id == Expense.id).join(
+        User, Expense.employee_id == User.id
+    ).filter(
+        Approval.approver_id == current_user.id, Approval.action.is_(None)
+    ).execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+    return stream_json_list({
+        'expense_id': row.expense_id,
+        'approval_id': row.approval_id,
+        'amount_converted': row.amount_converted,
+        'category': row.category,
+        'description': row.description,
+        'step': row.step,
+        'employee_email': row.email
+    } for row in rows)
 
 @app.route('/approvals/<int:approval_id>/approve', methods=['POST'])
 @login_required
 @role_required('manager', 'admin')
 def approve_expense(approval_id):
-    approval = Approval.query.get_or_404(approval_id)
+    approval = Approval.query.options(
+        joinedload(Approval.expense).joinedload(Expense.employee)
+    ).filter_by(id=approval_id).first_or_404()
     if approval.approver_id != current_user.id:
         abort(403)
     data = request.json
     approval.action = 'approved'
     approval.comments = data.get('comments', '')
-    db.session.commit()
     expense = approval.expense
-    workflow = Workflow.query.filter_by(company_id=current_user.company_id).first()
-    if workflow:
-        config = workflow.config
+    message = 'Approved'
+    config = get_workflow_config(current_user.company_id)
+    if config:
         exp_type = config.get('type', 'sequential')
         steps = config.get('steps', [])
         if exp_type == 'sequential':
@@ -389,54 +677,55 @@ def approve_expense(approval_id):
             if current_step < len(steps):
                 next_step_idx = current_step  # 0-based
                 next_step = steps[next_step_idx]
-                next_approver = determine_approver(expense.employee, next_step, current_user.company)
-                if next_approver:
+                role_to_uid = load_role_approvers(current_user.company_id, [next_step])
+                next_approver_id = determine_approver(expense.employee, next_step, role_to_uid)
+                if next_approver_id:
                     next_approval = Approval(
                         expense_id=expense.id,
-                        approver_id=next_approver.id,
+                        approver_id=next_approver_id,
                         step=current_step + 1
                     )
                     db.session.add(next_approval)
-                    db.session.commit()
-                    return jsonify({'message': 'Approved, forwarded to next'})
+                    message = 'Approved, forwarded to next'
             else:
                 expense.status = 'approved'
-                db.session.commit()
-                return jsonify({'message': 'Approved (final)'})
+                message = 'Approved (final)'
         elif exp_type == 'parallel_conditional':
             evaluate_conditional(expense.id, config)
-            return jsonify({'message': 'Approved, condition evaluated'})
+            message = 'Approved, condition evaluated'
     else:
         expense.status = 'approved'
-        db.session.commit()
-    return jsonify({'message': 'Approved'})
+    # Single commit for the whole action
+    db.session.commit()
+    return jsonify({'message': message})
 
 @app.route('/approvals/<int:approval_id>/reject', methods=['POST'])
 @login_required
 @role_required('manager', 'admin')
 def reject_expense(approval_id):
-    approval = Approval.query.get_or_404(approval_id)
+    approval = Approval.query.options(
+        joinedload(Approval.expense).joinedload(Expense.employee)
+    ).filter_by(id=approval_id).first_or_404()
     if approval.approver_id != current_user.id:
         abort(403)
     data = request.json
     approval.action = 'rejected'
     approval.comments = data.get('comments', '')
-    db.session.commit()
     expense = approval.expense
-    workflow = Workflow.query.filter_by(company_id=current_user.company_id).first()
-    if workflow and workflow.config.get('type') == 'parallel_conditional':
-        evaluate_conditional(expense.id, workflow.config)
+    config = get_workflow_config(current_user.company_id)
+    if config and config.get('type') == 'parallel_conditional':
+        evaluate_conditional(expense.id, config)
     else:
         expense.status = 'rejected'
         expense.comments = approval.comments
-        db.session.commit()
+    db.session.commit()
     return jsonify({'message': 'Rejected'})
 
 @app.route('/expenses/<int:expense_id>/override', methods=['POST'])
 @login_required
 @role_required('admin')
 def override_approval(expense_id):
-    expense = Expense.query.get_or_404(expense_id)
+    expense = Expense.query.options(joinedload(Expense.employee)).filter_by(id=expense_id).first_or_404()
     if expense.employee.company_id != current_user.company_id:
         abort(403)
     data = request.json
@@ -450,9 +739,7 @@ def override_approval(expense_id):
     else:
         return jsonify({'error': 'Invalid action'}), 400
     # Cancel pending approvals
-    pending_approvals = Approval.query.filter_by(expense_id=expense_id, action=None).all()
-    for pa in pending_approvals:
-        db.session.delete(pa)
+    Approval.query.filter_by(expense_id=expense_id, action=None).delete(synchronize_session=False)
     db.session.commit()
     return jsonify({'message': f'Expense {action}d'})
 
@@ -462,9 +749,9 @@ def override_approval(expense_id):
 def manage_workflows():
     company_id = current_user.company_id
     if request.method == 'GET':
-        workflow = Workflow.query.filter_by(company_id=company_id).first()
-        if workflow:
-            return jsonify({'config': workflow.config})
+        config = get_workflow_config(company_id)
+        if config:
+            return jsonify({'config': config})
         return jsonify({'error': 'No workflow'}), 404
     elif request.method == 'PUT':
         data = request.json
@@ -476,4 +763,5 @@ def manage_workflows():
             return jsonify({'error': 'Invalid config'}), 400
         workflow.config = config
         db.session.commit()
+        invalidate_workflow_config(company_id)
         return jsonify({'message': 'Workflow updated', 'config': workflow.config})
\ No newline at end of file
@@ -0,0 +1,101 @@
+# migrate.py
+# Upgrades an existing database to the current models in final.py:
+#   - user.role, expense.status and approval.action become SMALLINT codes (ROLE_CODES etc.)
+#   - the indexes declared in the models' __table_args__ are created if missing
+# Safe to re-run; a fresh database is simply created.
+# Usage: DATABASE_URL=... python migrate.py
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.types import Integer
+from final import app, db, User, Expense, Approval, ROLE_CODES, STATUS_CODES, ACTION_CODES
+
+CODE_COLUMNS = [
+    (User.__table__, 'role', ROLE_CODES),
+    (Expense.__table__, 'status', STATUS_CODES),
+    (Approval.__table__, 'action', ACTION_CODES),
+]
+
+def needs_migration(conn, table, column):
+    for col in inspect(conn).get_columns(table.name):
+        if col['name'] == column:
+            return not isinstance(col['type'], Integer)
+    return False
+
+def check_values(conn, table, column, codes):
+    q = conn.dialect.identifier_preparer.quote
+    allowed = set(codes) | {str(code) for code in codes.values()}
+    values = conn.exec_driver_sql(f'SELECT DISTINCT {q(column)} FROM {q(table.name)}').scalars().all()
+    unknown = [v for v in values if v is not None and str(v) not in allowed]
+    if unknown:
+        raise RuntimeError(f'{table.name}.{column} has values with no code: {unknown!r}')
+
+def code_case(conn, column, codes):
+    # Maps legacy strings (and already-numeric text such as '1') to their integer code
+    q = conn.dialect.identifier_preparer.quote(column)
+    as_text = f'CAST({q} AS TEXT)' if conn.dialect.name == 'sqlite' else f'{q}::text'
+    whens = ' '.join(
+        f"WHEN '{value}' THEN {code} WHEN '{code}' THEN {code}" for value, code in codes.items()
+    )
+    return f'CASE {as_text} {whens} END'
+
+def rebuild_sqlite_table(conn, table, column, codes):
+    # SQLite cannot change a column's type in place: copy into a new table and swap it in
+    q = conn.dialect.identifier_preparer.quote
+    existing = {col['name'] for col in inspect(conn).get_columns(table.name)}
+    scratch = MetaData()
+    for t in db.metadata.sorted_tables:
+        t.to_metadata(scratch)
+    new_table = table.to_metadata(scratch, name=f'{table.name}_migrate')
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {q(new_table.name)}')  # left over from a failed run
+    conn.execute(CreateTable(new_table))
+    names = [c.name for c in table.columns if c.name in existing]
+    selects = [code_case(conn, name, codes) if name == column else q(name) for name in names]
+    conn.exec_driver_sql(
+        f'INSERT INTO {q(new_table.name)} ({", ".join(q(n) for n in names)}) '
+        f'SELECT {", ".join(selects)} FROM {q(table.name)}'
+    )
+    conn.exec_driver_sql(f'DROP TABLE {q(table.name)}')
+    conn.exec_driver_sql(f'ALTER TABLE {q(new_table.name)} RENAME TO {q(table.name)}')
+
+def alter_postgresql_column(conn, table, column, codes):
+    q = conn.dialect.identifier_preparer.quote
+    conn.exec_driver_sql(
+        f'ALTER TABLE {q(table.name)} ALTER COLUMN {q(column)} '
+        f'TYPE SMALLINT USING {code_case(conn, column, codes)}'
+    )
+
+def create_indexes(conn):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+def migrate():
+    with app.app_context():
+        db.create_all()  # creates any missing tables; existing ones are left alone
+        with db.engine.connect() as conn:
+            dialect = conn.dialect.name
+            if dialect == 'sqlite':
+                # Dropping a referenced table would otherwise cascade-check its foreign keys
+                conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            pending = [c for c in CODE_COLUMNS if needs_migration(conn, c[0], c[1])]
+            # Validate everything before changing anything
+            for table, column, codes in pending:
+                check_values(conn, table, column, codes)
+            for table, column, codes in pending:
+                if dialect == 'sqlite':
+                    rebuild_sqlite_table(conn, table, column, codes)
+                elif dialect == 'postgresql':
+                    alter_postgresql_column(conn, table, column, codes)
+                else:
+                    raise RuntimeError(f'No migration for {dialect}; convert {table.name}.{column} manually')
+                print(f'Converted {table.name}.{column} to SMALLINT codes')
+            create_indexes(conn)
+            conn.commit()
+            if dialect == 'sqlite':
+                violations = conn.exec_driver_sql('PRAGMA foreign_key_check').all()
+                if violations:
+                    raise RuntimeError(f'Foreign key violations after migration: {violations!r}')
+                conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+if __name__ == '__main__':
+    migrate()
@@ -2,6 +2,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from sqlalchemy import func
+from sqlalchemy.types import TypeDecorator
 from enum import Enum
 
 db = SQLAlchemy()
@@ -16,6 +17,38 @@ class Status(Enum):
     APPROVED = 'approved'
     REJECTED = 'rejected'
 
+# Stored integer codes. These are persisted: never renumber or reuse a code.
+ROLE_CODES = {'admin': 1, 'manager': 2, 'employee': 3}
+STATUS_CODES = {'pending': 1, 'approved': 2, 'rejected': 3}
+ACTION_CODES = {'approved': STATUS_CODES['approved'], 'rejected': STATUS_CODES['rejected']}
+
+class EnumInt(TypeDecorator):
+    # Stores string values as small ints via a fixed code table; Python code keeps using the strings
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def __init__(self, codes, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = tuple(sorted(codes.items()))  # hashable, for the statement cache key
+        self._to_int = dict(codes)
+        self._from_int = {i: value for value, i in codes.items()}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, Enum):
+            value = value.value
+        if value not in self._to_int:
+            raise ValueError(f"Invalid value {value!r}, expected one of {sorted(self._to_int)}")
+        return self._to_int[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value not in self._from_int:
+            raise ValueError(f"Unknown stored code {value!r}; run migrate.py to convert legacy values")
+        return self._from_int[value]
+
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
@@ -27,10 +60,14 @@ class User(UserMixin, db.Model):
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.Enum('admin', 'manager', 'employee'), nullable=False)
+    role = db.Column(EnumInt(ROLE_CODES), nullable=False)
     manager_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     company = db.relationship('Company', backref='users')
     manager = db.relationship('User', remote_side=[id], backref='direct_subordinates')
+    __table_args__ = (
+        db.Index('ix_user_company_role', 'company_id', 'role'),
+        db.Index('ix_user_manager', 'manager_id'),
+    )
 
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -41,21 +78,28 @@ class Expense(db.Model):
     category = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text)
     date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.Enum('pending', 'approved', 'rejected'), default='pending')
+    status = db.Column(EnumInt(STATUS_CODES), default='pending')
     comments = db.Column(db.Text)
     receipt_url = db.Column(db.String(200))
     employee = db.relationship('User', backref='expenses')
+    __table_args__ = (
+        db.Index('ix_expense_employee', 'employee_id'),
+    )
 
 class Approval(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     expense_id = db.Column(db.Integer, db.ForeignKey('expense.id'), nullable=False)
     approver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     step = db.Column(db.Integer, default=1)
-    action = db.Column(db.Enum('approved', 'rejected'))
+    action = db.Column(EnumInt(ACTION_CODES))
     comments = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=func.now())
     approver = db.relationship('User')
     expense = db.relationship('Expense', backref='approvals')
+    __table_args__ = (
+        db.Index('ix_approval_approver_action', 'approver_id', 'action'),
+        db.Index('ix_approval_expense_action', 'expense_id', 'action'),
+    )
 
 class Workflow(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)